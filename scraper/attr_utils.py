@@ -0,0 +1,186 @@
+"""
+WooCommerce attribute extraction
+================================
+Shared by scraper.py and enrich-attributes.py so both read product
+attributes (marca, pais, region, tipo, varietal, volumen) the same way.
+
+Strategy (in order):
+  1. tr.woocommerce-product-attributes-item rows – the CSS class encodes
+     the slug (e.g. attribute_pa_tipo → tipo).
+  2. JSON-LD additionalProperty (only some products have this).
+"""
+
+import codecs
+import functools
+import re
+import unicodedata
+from typing import Iterable, Optional, Union
+
+import lxml.html
+import orjson
+from lxml.cssselect import CSSSelector
+
+# Map from normalised Spanish label → our slug key
+LABEL_MAP = {
+    "marca":    "marca",
+    "pais":     "pais",
+    "país":     "pais",
+    "region":   "region",
+    "región":   "region",
+    "tipo":     "tipo",
+    "varietal": "varietal",
+    "volumen":  "volumen",
+}
+
+WANTED_ATTRS = set(LABEL_MAP.values())
+
+# Cheap byte-level marker: a page without it has no attribute table.
+ATTR_ROW_MARKER = b"woocommerce-product-attributes-item"
+
+_ATTR_CLASS   = re.compile(r"attribute_pa_(\w+)")
+_ATTR_CLASS_B = re.compile(rb"attribute_pa_(\w+)")
+_WS           = re.compile(r"\s+")
+
+# JSON-LD blocks are sliced straight out of the raw HTML – no DOM needed.
+_LD_RE = re.compile(
+    rb'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.DOTALL | re.IGNORECASE,
+)
+
+# Selectors are compiled once at import time and reused for every page.
+_ATTR_ROW_SEL = CSSSelector("tr.woocommerce-product-attributes-item", translator="html")
+_TD_SEL       = CSSSelector("td", translator="html")
+_LD_SEL       = CSSSelector('script[type="application/ld+json"]', translator="html")
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=8)
+def _is_utf8(encoding: str) -> bool:
+    try:
+        return codecs.lookup(encoding).name == "utf-8"
+    except LookupError:
+        return True   # unknown charset: leave the bytes to orjson as before
+
+
+@functools.lru_cache(maxsize=256)
+def normalise(text: str) -> str:
+    """Lower-case + strip accents for robust label matching."""
+    nfkd = unicodedata.normalize("NFKD", text.lower().strip())
+    return "".join(c for c in nfkd if not unicodedata.combining(c))
+
+
+def parse_html(html: bytes, encoding: Optional[str] = None) -> lxml.html.HtmlElement:
+    """Parse raw HTML, decoding with the charset from the HTTP headers if given.
+
+    Without one lxml only honours a <meta charset> in the bytes and otherwise
+    decodes as Latin-1, which would turn a UTF-8 "PAÍS" into "PAÃ\x8dS".
+    """
+    if encoding:
+        try:
+            return lxml.html.fromstring(html, parser=lxml.html.HTMLParser(encoding=encoding))
+        except LookupError:
+            pass   # unknown charset name – fall back to lxml's own detection
+    return lxml.html.fromstring(html)
+
+
+def _label_slug(name: str) -> Optional[str]:
+    return LABEL_MAP.get(normalise(name.replace("pa_", "")))
+
+
+# Raw JSON-LD property names seen in practice ("Marca", "PAÍS", "pa_tipo", …)
+# resolved ahead of time, so the hot path is a single dict probe.
+FAST_LOOKUP = {
+    raw: slug
+    for label in LABEL_MAP
+    for variant in (label, label.capitalize(), label.upper())
+    for raw in (variant, "pa_" + variant)
+    if (slug := _label_slug(raw))
+}
+
+
+def _attrs_from_rows(tree: lxml.html.HtmlElement) -> dict:
+    attrs: dict = {}
+    for tr in _ATTR_ROW_SEL(tree):
+        m = _ATTR_CLASS.search(tr.get("class", ""))
+        if not m:
+            continue
+        slug = m.group(1)
+        if slug not in WANTED_ATTRS:
+            continue
+        tds = _TD_SEL(tr)
+        if tds:
+            value = _WS.sub(" ", " ".join(tds[0].itertext())).strip()
+            if value:
+                attrs[slug] = value
+    return attrs
+
+
+def _attrs_from_jsonld(blobs: Iterable[Union[str, bytes]]) -> dict:
+    attrs: dict = {}
+    for blob in blobs:
+        try:
+            data = orjson.loads(blob)
+            if isinstance(data, list):
+                data = next(
+                    (d for d in data if isinstance(d, dict) and d.get("@type") == "Product"),
+                    {}
+                )
+            if not isinstance(data, dict) or data.get("@type") != "Product":
+                continue
+            for prop in data.get("additionalProperty", []):
+                name  = prop.get("name", "")
+                value = prop.get("value", "")
+                if not (name and value):
+                    continue
+                slug = FAST_LOOKUP.get(name) or _label_slug(name)
+                if slug:
+                    attrs[slug] = str(value).strip()
+            if attrs:
+                return attrs
+        except Exception:
+            pass
+    return attrs
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def extract_attrs_from_tree(tree: lxml.html.HtmlElement) -> dict:
+    """Extract attributes from an already-parsed product page."""
+    return _attrs_from_rows(tree) or _attrs_from_jsonld(s.text or "" for s in _LD_SEL(tree))
+
+
+def extract_attrs_from_html_bytes(html: bytes, encoding: Optional[str] = None) -> dict:
+    """Extract attributes from raw product HTML.
+
+    The HTML is only parsed into a tree when it contains attribute rows;
+    JSON-LD is read with a regex over the raw bytes. encoding is the
+    charset from the response headers, if any (see parse_html).
+    """
+    if ATTR_ROW_MARKER in html:
+        attrs = _attrs_from_rows(parse_html(html, encoding))
+        if attrs:
+            return attrs
+    blobs = (m.group(1) for m in _LD_RE.finditer(html))
+    if encoding and not _is_utf8(encoding):
+        # orjson only reads UTF-8 bytes.
+        blobs = (b.decode(encoding, "replace") for b in blobs)
+    return _attrs_from_jsonld(blobs)
+
+
+def has_complete_attr_table(buf: Union[bytes, bytearray]) -> bool:
+    """True once the attribute table has been fully received and holds a wanted slug."""
+    start = buf.find(ATTR_ROW_MARKER)
+    if start == -1:
+        return False
+    end = buf.find(b"</table>", start)
+    if end == -1:
+        return False
+    return any(
+        m.group(1).decode() in WANTED_ATTRS
+        for m in _ATTR_CLASS_B.finditer(buf, start, end)
+    )
@@ -8,22 +8,35 @@ from each product page on panuts.com.
 Adds an "attributes" dict to each product with keys:
   marca, pais, region, tipo, varietal, volumen
 
-Strategy (in order):
-  1. Parse <dl class="woocommerce-product-attributes"> HTML (primary – works on all products)
+Strategy (in order, implemented in attr_utils.py):
+  1. Parse tr.woocommerce-product-attributes-item rows (primary – works on all products)
   2. Fall back to JSON-LD additionalProperty (only some products have this)
 
+Product pages are fetched concurrently (asyncio + httpx) with at most
+SCRAPER_CONCURRENCY requests in flight, multiplexed over HTTP/2 when the
+server supports it.
+
+products.json is streamed: products are read one at a time (ijson), enriched
+and written to a temporary file that atomically replaces the original once
+every product is done, so an interrupted run leaves products.json intact.
+
 Usage (inside the scraper container):
   python enrich-attributes.py
 """
 
-import json
+import asyncio
+import math
 import os
-import re
 import time
-import unicodedata
+from collections import deque
+from typing import BinaryIO
+
+import httpx
+import ijson
+import orjson
 
-import requests
-from bs4 import BeautifulSoup
+from attr_utils import extract_attrs_from_html_bytes, has_complete_attr_table
+from http_cache import ConditionalCache
 
 # ---------------------------------------------------------------------------
 # Config
@@ -32,6 +45,13 @@ OUTPUT_DIR  = os.getenv("SCRAPER_OUTPUT_DIR", "/output")
 INPUT_FILE  = os.path.join(OUTPUT_DIR, "products.json")
 OUTPUT_FILE = INPUT_FILE            # overwrite in-place
 DELAY       = float(os.getenv("SCRAPER_DELAY", "1.0"))
+CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY", "10"))
+CACHE_FILE  = os.path.join(OUTPUT_DIR, "enrich-cache.json")   # ETag/Last-Modified per product URL
+CACHE_VERSION = 1   # bump whenever attr_utils output changes
+WINDOW      = CONCURRENCY * 4   # products held in memory while their pages are fetched
+
+READ_CHUNK     = 16 * 1024      # bytes per streamed read
+MAX_PAGE_BYTES = 256 * 1024     # stop downloading a page past this size
 
 HEADERS = {
     "User-Agent": (
@@ -40,88 +60,94 @@ HEADERS = {
     ),
     "Accept-Language": "es-PE,es;q=0.9,en;q=0.8",
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    # Requires the brotli package (requirements.txt) for httpx to decode "br".
+    "Accept-Encoding": "br, gzip, deflate",
 }
 
-# Map from normalised Spanish label → our slug key
-LABEL_MAP = {
-    "marca":    "marca",
-    "pais":     "pais",
-    "país":     "pais",
-    "region":   "region",
-    "región":   "region",
-    "tipo":     "tipo",
-    "varietal": "varietal",
-    "volumen":  "volumen",
-}
-
-WANTED_ATTRS = set(LABEL_MAP.values())
-
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
-def normalise(text: str) -> str:
-    """Lower-case + strip accents for robust label matching."""
-    nfkd = unicodedata.normalize("NFKD", text.lower().strip())
-    return "".join(c for c in nfkd if not unicodedata.combining(c))
+class AsyncTokenBucket:
+    """Token bucket shared by all fetch tasks; acquire() waits for a free token.
+
+    Waiters queue on the lock, so the whole script never exceeds rate_per_sec
+    requests per second regardless of CONCURRENCY.
+    """
+
+    def __init__(self, rate_per_sec: float, capacity: float = 1.0):
+        self.rate     = rate_per_sec
+        self.capacity = capacity
+        self.tokens   = capacity
+        self.updated  = time.monotonic()
+        self.lock     = asyncio.Lock()
 
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens  = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
 
-def fetch_attributes(session: requests.Session, url: str) -> dict:
-    """Fetch a product page and extract attributes.
+    async def acquire(self) -> None:
+        if math.isinf(self.rate):
+            return
+        async with self.lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
 
-    Strategy 1 (primary): tr.woocommerce-product-attributes-item rows –
-      the class name encodes the slug (e.g. attribute_pa_tipo → tipo).
-    Strategy 2 (fallback): JSON-LD additionalProperty.
+
+_encoding_logged = False
+
+
+def _log_encoding_once(resp: httpx.Response) -> None:
+    global _encoding_logged
+    if not _encoding_logged:
+        _encoding_logged = True
+        print(f"  Content-Encoding: {resp.headers.get('Content-Encoding', 'identity')}")
+
+
+async def read_product_html(resp: httpx.Response) -> bytes:
+    """Stream the body and stop as soon as the attribute table is complete.
+
+    Pages without a usable table are read to the end (up to MAX_PAGE_BYTES)
+    so the JSON-LD fallback still sees the blocks printed in the footer.
+    """
+    buf = bytearray()
+    async for chunk in resp.aiter_bytes(READ_CHUNK):
+        buf += chunk
+        if len(buf) >= MAX_PAGE_BYTES or has_complete_attr_table(buf):
+            break
+    return bytes(buf)
+
+
+async def fetch_attributes(
+    client: httpx.AsyncClient,
+    sem: asyncio.Semaphore,
+    bucket: AsyncTokenBucket,
+    cache: ConditionalCache,
+    url: str,
+) -> dict:
+    """Fetch a product page and extract attributes (see attr_utils).
+
+    Pages seen on a previous run are revalidated with a conditional GET;
+    on 304 Not Modified the cached attributes are returned unchanged.
     """
     try:
-        resp = session.get(url, headers=HEADERS, timeout=15)
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "lxml")
-
-        attrs: dict = {}
-
-        # ── Strategy 1: <tr class="...attribute_pa_SLUG"> ───────────────────
-        for tr in soup.select("tr.woocommerce-product-attributes-item"):
-            classes = " ".join(tr.get("class", []))
-            m = re.search(r"attribute_pa_(\w+)", classes)
-            if not m:
-                continue
-            slug = m.group(1)
-            if slug not in WANTED_ATTRS:
-                continue
-            td = tr.select_one("td")
-            if td:
-                value = re.sub(r"\s+", " ", td.get_text(" ", strip=True)).strip()
-                if value:
-                    attrs[slug] = value
-
-        # ── Strategy 2: JSON-LD additionalProperty ──────────────────────────
-        if not attrs:
-            for script in soup.select('script[type="application/ld+json"]'):
-                try:
-                    data = json.loads(script.string or "")
-                    if isinstance(data, list):
-                        data = next(
-                            (d for d in data if isinstance(d, dict) and d.get("@type") == "Product"),
-                            {}
-                        )
-                    if not isinstance(data, dict) or data.get("@type") != "Product":
-                        continue
-                    for prop in data.get("additionalProperty", []):
-                        name  = prop.get("name", "")
-                        value = prop.get("value", "")
-                        if not (name and value):
-                            continue
-                        key = normalise(name.replace("pa_", ""))
-                        slug = LABEL_MAP.get(key)
-                        if slug:
-                            attrs[slug] = str(value).strip()
-                    if attrs:
-                        break
-                except Exception:
-                    pass
-
+        async with sem:
+            await bucket.acquire()
+            async with client.stream("GET", url, headers=cache.headers_for(url)) as resp:
+                if resp.status_code == 304:
+                    return cache.payload(url) or {}
+                resp.raise_for_status()
+                _log_encoding_once(resp)
+                html = await read_product_html(resp)
+                resp_headers = resp.headers
+
+        attrs = extract_attrs_from_html_bytes(html, resp.charset_encoding)
+        cache.store(url, resp_headers, attrs)
         return attrs
 
     except Exception as exc:
@@ -132,45 +158,81 @@ def fetch_attributes(session: requests.Session, url: str) -> dict:
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
-def main() -> None:
-    if not os.path.exists(INPUT_FILE):
-        print(f"[error] {INPUT_FILE} not found. Run the scraper first.")
-        return
-
-    with open(INPUT_FILE, encoding="utf-8") as f:
-        products: list[dict] = json.load(f)
-
-    total = len(products)
-    print("=" * 60)
-    print(f"Attribute enrichment – {total} products")
-    print("=" * 60)
+async def enrich_stream(f_in: BinaryIO, f_out: BinaryIO) -> tuple[int, int, int]:
+    """Enrich every product of the JSON array in f_in and write the array to f_out.
 
-    session = requests.Session()
+    At most WINDOW products are in memory at once; they are fetched
+    concurrently and written back in input order. Returns (total, enriched, skipped).
+    """
+    total    = 0
     enriched = 0
     skipped  = 0
+    first    = True
+
+    sem    = asyncio.Semaphore(CONCURRENCY)
+    bucket = AsyncTokenBucket(1.0 / DELAY if DELAY > 0 else math.inf)
+    cache  = ConditionalCache(CACHE_FILE, CACHE_VERSION)
+    limits = httpx.Limits(max_connections=32, max_keepalive_connections=16)
 
-    for i, product in enumerate(products, 1):
+    async def enrich_one(i: int, product: dict) -> dict:
+        nonlocal enriched, skipped
         url = product.get("url", "")
         if not url:
             skipped += 1
-            continue
+            return product
 
-        print(f"  [{i}/{total}] {url}")
-        attrs = fetch_attributes(session, url)
+        attrs = await fetch_attributes(client, sem, bucket, cache, url)
         product["attributes"] = attrs
 
+        print(f"  [{i}] {url}")
         if attrs:
             enriched += 1
             print(f"    ✓ {attrs}")
         else:
             print(f"    – (no attributes found)")
+        return product
+
+    def write(product: dict) -> None:
+        nonlocal first
+        f_out.write(b"\n" if first else b",\n")
+        f_out.write(orjson.dumps(product, option=orjson.OPT_INDENT_2))
+        first = False
+
+    window: deque[asyncio.Task] = deque()
+    f_out.write(b"[")
+    try:
+        async with httpx.AsyncClient(
+            http2=True, headers=HEADERS, timeout=15, limits=limits, follow_redirects=True
+        ) as client:
+            for total, product in enumerate(ijson.items(f_in, "item", use_float=True), 1):
+                window.append(asyncio.create_task(enrich_one(total, product)))
+                if len(window) >= WINDOW:
+                    write(await window.popleft())
+            while window:
+                write(await window.popleft())
+    finally:
+        cache.save()
+    f_out.write(b"]" if first else b"\n]")
+
+    return total, enriched, skipped
+
+
+def main() -> None:
+    if not os.path.exists(INPUT_FILE):
+        print(f"[error] {INPUT_FILE} not found. Run the scraper first.")
+        return
+
+    print("=" * 60)
+    print(f"Attribute enrichment – {INPUT_FILE}")
+    print("=" * 60)
 
-        time.sleep(DELAY)
+    tmp_file = OUTPUT_FILE + ".tmp"
+    with open(INPUT_FILE, "rb") as f_in, open(tmp_file, "wb") as f_out:
+        total, enriched, skipped = asyncio.run(enrich_stream(f_in, f_out))
 
     print()
     print(f"Writing enriched data to {OUTPUT_FILE}…")
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(products, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, OUTPUT_FILE)
 
     print()
     print("Done!")
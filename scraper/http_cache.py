@@ -0,0 +1,81 @@
+"""
+Conditional-GET cache
+=====================
+Remembers each URL's ETag / Last-Modified validators together with the
+result extracted from the page, so re-runs can send If-None-Match /
+If-Modified-Since and reuse the stored result on 304 Not Modified.
+
+Persisted as a small JSON file in the output directory. Shared by
+scraper.py (thread pool) and enrich-attributes.py (asyncio).
+
+Each entry also records the caller's CACHE_VERSION; entries written by a
+different version are ignored, so a change to the extraction code is
+picked up on the next run instead of replaying stale results.
+"""
+
+import os
+import threading
+from typing import Any, Mapping, Optional
+
+import orjson
+
+
+class ConditionalCache:
+    """URL → {"version", "etag", "last_modified", "payload"} persisted between runs."""
+
+    def __init__(self, path: str, version: int):
+        self.path    = path
+        self.version = version
+        self.lock    = threading.Lock()
+        try:
+            with open(path, "rb") as f:
+                self.entries: dict[str, dict] = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            self.entries = {}
+
+    def _entry(self, url: str) -> Optional[dict]:
+        entry = self.entries.get(url)
+        if entry and entry.get("version") == self.version:
+            return entry
+        return None
+
+    def headers_for(self, url: str) -> dict[str, str]:
+        """Conditional request headers for url, or {} if nothing usable is cached."""
+        entry = self._entry(url)
+        if not entry:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def payload(self, url: str) -> Optional[Any]:
+        """The result stored for url on its last 200 response, by this version."""
+        entry = self._entry(url)
+        return entry["payload"] if entry else None
+
+    def store(self, url: str, headers: Mapping[str, str], payload: Any) -> None:
+        """Record the validators of a 200 response along with its extracted result."""
+        etag          = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        with self.lock:
+            if not (etag or last_modified):
+                # Nothing to revalidate with – don't keep a stale entry around.
+                self.entries.pop(url, None)
+                return
+            self.entries[url] = {
+                "version":       self.version,
+                "etag":          etag,
+                "last_modified": last_modified,
+                "payload":       payload,
+            }
+
+    def save(self) -> None:
+        tmp = self.path + ".tmp"
+        with self.lock:
+            data = orjson.dumps(self.entries)
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
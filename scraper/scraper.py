@@ -9,19 +9,30 @@ Environment variables:
   SCRAPER_OUTPUT_DIR  – where to write products.json (default: /output)
   SCRAPER_DELAY       – seconds between requests (default: 1.5)
   SCRAPER_MAX_PAGES   – max catalogue pages to crawl (default: 20)
+  SCRAPER_CONCURRENCY – product pages fetched in parallel (default: 8)
 """
 
-import json
+import functools
+import math
 import os
 import re
+import threading
 import time
 import urllib.robotparser
-from dataclasses import dataclass, field, asdict
-from typing import Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, fields
+from typing import Callable, Optional
 from urllib.parse import urljoin, urlparse
 
+import lxml.html
+import orjson
 import requests
-from bs4 import BeautifulSoup
+from lxml.cssselect import CSSSelector
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from attr_utils import extract_attrs_from_tree, parse_html
+from http_cache import ConditionalCache
 
 # ---------------------------------------------------------------------------
 # Config
@@ -30,7 +41,11 @@ BASE_URL        = "https://panuts.com"
 OUTPUT_DIR      = os.getenv("SCRAPER_OUTPUT_DIR", "/output")
 DELAY           = float(os.getenv("SCRAPER_DELAY", "1.5"))
 MAX_PAGES       = int(os.getenv("SCRAPER_MAX_PAGES", "20"))
+CONCURRENCY     = int(os.getenv("SCRAPER_CONCURRENCY", "8"))
 OUTPUT_FILE     = os.path.join(OUTPUT_DIR, "products.json")
+JSONL_FILE      = os.path.join(OUTPUT_DIR, "products.jsonl")   # one product per line, written as scraped
+CACHE_FILE      = os.path.join(OUTPUT_DIR, "scrape-cache.json")  # ETag/Last-Modified per product URL
+CACHE_VERSION   = 1   # bump whenever parse_product_page / attr_utils output changes
 
 HEADERS = {
     "User-Agent": (
@@ -39,12 +54,14 @@ HEADERS = {
     ),
     "Accept-Language": "es-CO,es;q=0.9,en;q=0.8",
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    # Requires the brotli package (requirements.txt) for urllib3 to decode "br".
+    "Accept-Encoding": "br, gzip, deflate",
 }
 
 # ---------------------------------------------------------------------------
 # Data model
 # ---------------------------------------------------------------------------
-@dataclass
+@dataclass(slots=True)
 class Product:
     name: str
     sku: str
@@ -62,84 +79,65 @@ class Product:
     external_id: str = ""
     attributes: dict = field(default_factory=dict)  # marca, pais, region, tipo, varietal, volumen
 
+    def to_dict(self) -> dict:
+        """Shallow field dict for serialisation (asdict() would deep-copy every list)."""
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
-import unicodedata
-
-ATTR_LABEL_MAP = {
-    "marca":    "marca",
-    "pais":     "pais",
-    "país":     "pais",
-    "region":   "region",
-    "región":   "region",
-    "tipo":     "tipo",
-    "varietal": "varietal",
-    "volumen":  "volumen",
+_PRICE_STRIP   = re.compile(r"[^\d,.]")
+# "S/. 1,556.00" / "S/ 13.90": currency prefix (no digits or commas), then an
+# unambiguous number – comma-grouped with a decimal part, or no commas at all.
+_FAST_PRICE    = re.compile(r"[^\d,]*([0-9]{1,3}(?:,[0-9]{3})+\.[0-9]+|[0-9]+(?:\.[0-9]+)?)\s*")
+_PRODUCT_PATH  = re.compile(r"/(producto|product)/[^/]+/?$")
+# Cheap check on the raw href so only likely product links reach urljoin/urlparse.
+_PRODUCT_HREF  = re.compile(r"(producto|product)/[^/]+")
+
+
+# Selectors are compiled once at import time and reused for every page.
+# A comma-separated group compiles to a single XPath union whose matches come
+# back in document order, so one query replaces a chain of fallbacks. Only
+# used for the ins/del prices, where both alternatives are the same amount
+# (an .amount wrapper resolves to its inner <bdi>).
+SELECTORS = {
+    name: CSSSelector(css, translator="html")
+    for name, css in {
+        "anchors":       "a[href]",
+        "bdi":           "bdi",
+        "product_title": ".product_title",
+        "entry_title":   "h1.entry-title",
+        "h1":            "h1",
+        "sku":           ".sku",
+        "sale_price":    ".price ins bdi, .price ins .amount",
+        "regular_price": ".price del bdi, .price del .amount",
+        "current_price": ".price > .woocommerce-Price-amount bdi",
+        "price_bdi":     ".price bdi",
+        "price_amount":  ".price .amount",
+        "short_desc":    ".woocommerce-product-details__short-description",
+        "tab_desc":      "#tab-description .woocommerce-Tabs-panel",
+        "entry_content": ".entry-content",
+        "categories":    ".posted_in a",
+        "tags":          ".tagged_as a",
+        "gallery_links": ".woocommerce-product-gallery__image a",
+        "gallery_imgs":  ".woocommerce-product-gallery__image img",
+        "stock":         ".stock",
+        "add_to_cart":   ".single_add_to_cart_button",
+        "next_page":     ".next.page-numbers, a.next",
+        "category_nav":  ".product-categories a, .widget_product_categories a",
+    }.items()
 }
 
 
-def _norm(text: str) -> str:
-    nfkd = unicodedata.normalize("NFKD", text.lower().strip())
-    return "".join(c for c in nfkd if not unicodedata.combining(c))
-
-
-WANTED_ATTRS_SET = set(ATTR_LABEL_MAP.values())
-
+def _first(selector: CSSSelector, el: lxml.html.HtmlElement) -> Optional[lxml.html.HtmlElement]:
+    found = selector(el)
+    return found[0] if found else None
 
-def extract_attributes(soup: BeautifulSoup) -> dict:
-    """Extract WooCommerce product attributes.
 
-    Strategy 1 (primary): tr.woocommerce-product-attributes-item rows –
-      the CSS class encodes the slug (e.g. attribute_pa_tipo → tipo).
-    Strategy 2 (fallback): JSON-LD additionalProperty.
-    """
-    attrs: dict = {}
-
-    # Strategy 1 – <tr class="...attribute_pa_SLUG">
-    for tr in soup.select("tr.woocommerce-product-attributes-item"):
-        classes = " ".join(tr.get("class", []))
-        m = re.search(r"attribute_pa_(\w+)", classes)
-        if not m:
-            continue
-        slug = m.group(1)
-        if slug not in WANTED_ATTRS_SET:
-            continue
-        td = tr.select_one("td")
-        if td:
-            value = re.sub(r"\s+", " ", td.get_text(" ", strip=True)).strip()
-            if value:
-                attrs[slug] = value
-
-    if attrs:
-        return attrs
-
-    # Strategy 2 – JSON-LD additionalProperty
-    for script in soup.select('script[type="application/ld+json"]'):
-        try:
-            data = json.loads(script.string or "")
-            if isinstance(data, list):
-                data = next(
-                    (d for d in data if isinstance(d, dict) and d.get("@type") == "Product"),
-                    {}
-                )
-            if not isinstance(data, dict) or data.get("@type") != "Product":
-                continue
-            for prop in data.get("additionalProperty", []):
-                name  = prop.get("name", "")
-                value = prop.get("value", "")
-                if not (name and value):
-                    continue
-                slug = ATTR_LABEL_MAP.get(_norm(name.replace("pa_", "")))
-                if slug:
-                    attrs[slug] = str(value).strip()
-            if attrs:
-                return attrs
-        except Exception:
-            pass
-
-    return {}
+def _text(el: lxml.html.HtmlElement, sep: str = "") -> str:
+    """Stripped text of all descendant strings joined by sep (like bs4's get_text(sep, strip=True))."""
+    return sep.join(t for t in (s.strip() for s in el.itertext()) if t)
 
 
 def parse_price(text: str) -> float:
@@ -151,7 +149,14 @@ def parse_price(text: str) -> float:
     """
     if not text:
         return 0.0
-    cleaned = re.sub(r"[^\d,\.]", "", text)
+    m = _FAST_PRICE.fullmatch(text)
+    if m:
+        return float(m.group(1).replace(",", ""))
+    return _parse_price_generic(text)
+
+
+def _parse_price_generic(text: str) -> float:
+    cleaned = _PRICE_STRIP.sub("", text)
     cleaned = cleaned.strip(".")   # remove leading dots from "S/." currency prefix
     if "," in cleaned and "." in cleaned:
         comma_pos = cleaned.rfind(",")
@@ -170,36 +175,116 @@ def parse_price(text: str) -> float:
         return 0.0
 
 
-def get_page(session: requests.Session, url: str) -> Optional[BeautifulSoup]:
-    """Fetch a page and return parsed BeautifulSoup, or None on error."""
+class TokenBucket:
+    """Thread-safe token bucket shared by all workers.
+
+    acquire() blocks until a token is available, so the whole process never
+    exceeds rate_per_sec requests per second no matter how many threads call it.
+    """
+
+    def __init__(self, rate_per_sec: float, capacity: float = 1.0):
+        self.rate     = rate_per_sec
+        self.capacity = capacity
+        self.tokens   = capacity
+        self.updated  = time.monotonic()
+        self.lock     = threading.Lock()
+
+    def acquire(self) -> None:
+        if math.isinf(self.rate):
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens  = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def build_session() -> requests.Session:
+    """Create the shared session with a sized keep-alive pool and GET retries."""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=32,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            raise_on_status=False,   # let raise_for_status() report the final response
+        ),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_encoding_logged = threading.Event()
+
+
+def fetch(
+    session: requests.Session, bucket: TokenBucket, url: str, headers: Optional[dict] = None
+) -> Optional[requests.Response]:
+    """Rate-limited GET; returns the response (2xx or 304), or None on error."""
     try:
-        resp = session.get(url, headers=HEADERS, timeout=15)
+        bucket.acquire()
+        resp = session.get(url, headers={**HEADERS, **(headers or {})}, timeout=15)
         resp.raise_for_status()
-        return BeautifulSoup(resp.text, "lxml")
+        if not _encoding_logged.is_set():
+            _encoding_logged.set()
+            print(f"  Content-Encoding: {resp.headers.get('Content-Encoding', 'identity')}")
+        return resp
     except Exception as exc:
         print(f"  [warn] Could not fetch {url}: {exc}")
         return None
 
 
+def _header_charset(resp: requests.Response) -> Optional[str]:
+    """Charset declared in Content-Type, or None (requests assumes Latin-1 for any text/*)."""
+    if "charset=" in resp.headers.get("Content-Type", "").lower():
+        return resp.encoding
+    return None
+
+
+def get_page(session: requests.Session, bucket: TokenBucket, url: str) -> Optional[lxml.html.HtmlElement]:
+    """Fetch a page (rate-limited by bucket) and return the parsed lxml tree, or None on error."""
+    resp = fetch(session, bucket, url)
+    if resp is None:
+        return None
+    try:
+        return parse_html(resp.content, _header_charset(resp))
+    except Exception as exc:
+        print(f"  [warn] Could not parse {url}: {exc}")
+        return None
+
+
 # ---------------------------------------------------------------------------
 # robots.txt check
 # ---------------------------------------------------------------------------
-def build_robot_parser() -> urllib.robotparser.RobotFileParser:
+def build_robot_parser(session: requests.Session, bucket: TokenBucket) -> urllib.robotparser.RobotFileParser:
     """
     Fetch robots.txt using our requests session (with proper User-Agent) and
     parse it manually. Python's urllib.robotparser.read() does NOT send custom
     headers, so many sites return 403 — which the spec interprets as "disallow
     all". We avoid that by fetching ourselves and calling rp.parse(lines).
+    Going through the shared session also keeps the connection alive for the
+    first catalogue request.
     """
     rp = urllib.robotparser.RobotFileParser()
     robots_url = urljoin(BASE_URL, "/robots.txt")
     rp.set_url(robots_url)
 
     try:
-        import requests as _req
-        resp = _req.get(robots_url, headers=HEADERS, timeout=10)
+        bucket.acquire()
+        resp = session.get(robots_url, headers=HEADERS, timeout=10)
         if resp.status_code == 200:
-            rp.parse(resp.text.splitlines())
+            # Decode explicitly – resp.text would guess the charset.
+            rp.parse(resp.content.decode("utf-8", errors="replace").splitlines())
         elif resp.status_code in (401, 403):
             # Server explicitly forbids access – treat as "disallow all".
             rp.disallow_all = True
@@ -210,41 +295,53 @@ def build_robot_parser() -> urllib.robotparser.RobotFileParser:
     return rp
 
 
+def cached_can_fetch(rp: urllib.robotparser.RobotFileParser) -> Callable[[str], bool]:
+    """Memoise rp.can_fetch("*", url) – catalogue pages repeat the same links many times."""
+
+    @functools.lru_cache(maxsize=4096)
+    def can_fetch(url: str) -> bool:
+        return rp.can_fetch("*", url)
+
+    return can_fetch
+
+
 # ---------------------------------------------------------------------------
 # Product page parser
 # ---------------------------------------------------------------------------
-def parse_product_page(soup: BeautifulSoup, url: str) -> Optional[Product]:
+def parse_product_page(tree: lxml.html.HtmlElement, url: str) -> Optional[Product]:
     """Extract product data from a WooCommerce product page."""
     try:
         # Name
-        name_el = (
-            soup.select_one(".product_title")
-            or soup.select_one("h1.entry-title")
-            or soup.select_one("h1")
-        )
-        name = name_el.get_text(strip=True) if name_el else ""
+        name_el = _first(SELECTORS["product_title"], tree)
+        if name_el is None:
+            name_el = _first(SELECTORS["entry_title"], tree)
+        if name_el is None:
+            name_el = _first(SELECTORS["h1"], tree)
+        name = _text(name_el) if name_el is not None else ""
         if not name:
             return None
 
         # SKU
-        sku_el = soup.select_one(".sku")
-        sku = sku_el.get_text(strip=True) if sku_el else ""
+        sku_el = _first(SELECTORS["sku"], tree)
+        sku = _text(sku_el) if sku_el is not None else ""
 
         # Prices — panuts uses <bdi> inside .price (not .amount)
-        def extract_price(sel: str) -> float:
-            el = soup.select_one(sel)
-            if not el:
+        def extract_price(key: str) -> float:
+            el = _first(SELECTORS[key], tree)
+            if el is None:
                 return 0.0
-            bdi = el.select_one("bdi")
-            text = bdi.get_text(strip=True) if bdi else el.get_text(strip=True)
+            bdi = _first(SELECTORS["bdi"], el)
+            text = _text(bdi) if bdi is not None else _text(el)
             return parse_price(text)
 
-        sale_price_raw    = extract_price(".price ins bdi") or extract_price(".price ins .amount")
-        regular_price_raw = extract_price(".price del bdi") or extract_price(".price del .amount")
+        sale_price_raw    = extract_price("sale_price")
+        regular_price_raw = extract_price("regular_price")
+        # Ordered like the title: a union would let a looser .price bdi / .amount
+        # earlier in the page win over the strict top-level amount.
         current_price_raw = (
-            extract_price(".price > .woocommerce-Price-amount bdi")
-            or extract_price(".price bdi")
-            or extract_price(".price .amount")
+            extract_price("current_price")
+            or extract_price("price_bdi")
+            or extract_price("price_amount")
         )
 
         current_price = sale_price_raw or current_price_raw
@@ -252,42 +349,42 @@ def parse_product_page(soup: BeautifulSoup, url: str) -> Optional[Product]:
         sale_price    = sale_price_raw if regular_price_raw else None
 
         # Descriptions
-        short_desc_el = soup.select_one(".woocommerce-product-details__short-description")
-        short_desc    = short_desc_el.get_text(" ", strip=True) if short_desc_el else ""
+        short_desc_el = _first(SELECTORS["short_desc"], tree)
+        short_desc    = _text(short_desc_el, " ") if short_desc_el is not None else ""
 
-        full_desc_el  = soup.select_one("#tab-description .woocommerce-Tabs-panel")
-        if not full_desc_el:
-            full_desc_el = soup.select_one(".entry-content")
-        full_desc = full_desc_el.get_text(" ", strip=True) if full_desc_el else short_desc
+        full_desc_el  = _first(SELECTORS["tab_desc"], tree)
+        if full_desc_el is None:
+            full_desc_el = _first(SELECTORS["entry_content"], tree)
+        full_desc = _text(full_desc_el, " ") if full_desc_el is not None else short_desc
 
         # Categories
         cats = []
-        for el in soup.select(".posted_in a"):
-            cats.append(el.get_text(strip=True))
+        for el in SELECTORS["categories"](tree):
+            cats.append(_text(el))
 
         # Tags
         tags = []
-        for el in soup.select(".tagged_as a"):
-            tags.append(el.get_text(strip=True))
+        for el in SELECTORS["tags"](tree):
+            tags.append(_text(el))
 
         # Images
         images = []
-        for el in soup.select(".woocommerce-product-gallery__image a"):
+        for el in SELECTORS["gallery_links"](tree):
             href = el.get("href", "")
             if href:
                 images.append(href)
         if not images:
-            for el in soup.select(".woocommerce-product-gallery__image img"):
+            for el in SELECTORS["gallery_imgs"](tree):
                 src = el.get("data-large_image") or el.get("src") or ""
                 if src:
                     images.append(src)
 
         # Stock
-        stock_el = soup.select_one(".stock")
-        if stock_el:
-            stock_text   = stock_el.get_text(strip=True).lower()
+        stock_el = _first(SELECTORS["stock"], tree)
+        if stock_el is not None:
+            stock_text   = _text(stock_el).lower()
             stock_status = "instock" if "disponible" in stock_text or "in stock" in stock_text else "outofstock"
-        elif soup.select_one(".single_add_to_cart_button"):
+        elif _first(SELECTORS["add_to_cart"], tree) is not None:
             stock_status = "instock"
         else:
             stock_status = "outofstock"
@@ -295,8 +392,8 @@ def parse_product_page(soup: BeautifulSoup, url: str) -> Optional[Product]:
         # External ID from URL slug
         slug = urlparse(url).path.strip("/").split("/")[-1]
 
-        # Attributes from JSON-LD structured data (marca, pais, region, tipo, varietal, volumen)
-        attributes = extract_attributes(soup)
+        # Attributes (marca, pais, region, tipo, varietal, volumen) – see attr_utils
+        attributes = extract_attrs_from_tree(tree)
 
         return Product(
             name=name,
@@ -323,8 +420,44 @@ def parse_product_page(soup: BeautifulSoup, url: str) -> Optional[Product]:
 # ---------------------------------------------------------------------------
 # Catalogue crawler
 # ---------------------------------------------------------------------------
-def discover_product_urls(session: requests.Session, rp: urllib.robotparser.RobotFileParser) -> list[str]:
-    """Crawl shop / category pages and collect product URLs."""
+def _crawl_catalogue_page(
+    session: requests.Session, bucket: TokenBucket, page_url: str
+) -> Optional[tuple[set[str], list[str]]]:
+    """Fetch one catalogue page; returns (product URLs, catalogue links to follow)."""
+    tree = get_page(session, bucket, page_url)
+    if tree is None:
+        return None
+
+    # Collect product links
+    base_netloc = urlparse(BASE_URL).netloc
+    found: set[str] = set()
+    for a in SELECTORS["anchors"](tree):
+        href = a.get("href")
+        if not _PRODUCT_HREF.search(href):
+            continue
+        absolute = urljoin(BASE_URL, href)
+        parsed   = urlparse(absolute)
+        if parsed.netloc != base_netloc:
+            continue
+        # WooCommerce product URLs typically contain /producto/ or /product/
+        if _PRODUCT_PATH.search(parsed.path):
+            found.add(absolute)
+
+    # Follow pagination, then category links (avoid pagination and misc links)
+    links = [urljoin(BASE_URL, a.get("href", "")) for a in SELECTORS["next_page"](tree)]
+    links += [urljoin(BASE_URL, a.get("href", "")) for a in SELECTORS["category_nav"](tree)]
+    return found, links
+
+
+def discover_product_urls(
+    session: requests.Session, bucket: TokenBucket, can_fetch: Callable[[str], bool]
+) -> list[str]:
+    """Crawl shop / category pages and collect product URLs.
+
+    Breadth-first over a concurrent frontier: up to CONCURRENCY catalogue
+    pages are in flight at once, all paced by the shared bucket. Frontier
+    bookkeeping stays on this thread, so it needs no locking.
+    """
     product_urls: set[str] = set()
 
     # Entry points to try
@@ -336,53 +469,79 @@ def discover_product_urls(session: requests.Session, rp: urllib.robotparser.Robo
     ]
 
     visited_cat_pages: set[str] = set()
-    pages_to_visit = []
+    pending: dict = {}
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+
+        def visit(page_url: str) -> None:
+            if page_url in visited_cat_pages or len(visited_cat_pages) >= MAX_PAGES:
+                return
+            if not can_fetch(page_url):
+                return
+            visited_cat_pages.add(page_url)
+            print(f"  Crawling catalogue page {len(visited_cat_pages)}: {page_url}")
+            pending[pool.submit(_crawl_catalogue_page, session, bucket, page_url)] = page_url
+
+        for ep in entry_points:
+            visit(ep)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                del pending[fut]
+                result = fut.result()
+                if result is None:
+                    continue
+                found, links = result
+                product_urls |= found
+                for link in links:
+                    visit(link)
 
-    for ep in entry_points:
-        if rp.can_fetch("*", ep):
-            pages_to_visit.append(ep)
+    return list(product_urls)
 
-    page_count = 0
-    while pages_to_visit and page_count < MAX_PAGES:
-        page_url = pages_to_visit.pop(0)
-        if page_url in visited_cat_pages:
-            continue
-        visited_cat_pages.add(page_url)
-        page_count += 1
 
-        print(f"  Crawling catalogue page {page_count}: {page_url}")
-        soup = get_page(session, page_url)
-        if not soup:
-            time.sleep(DELAY)
-            continue
+def _scrape_one(
+    session: requests.Session, bucket: TokenBucket, cache: ConditionalCache, url: str
+) -> Optional[Product]:
+    """Fetch and parse a single product page (runs in a worker thread).
 
-        # Collect product links
-        for a in soup.select("a[href]"):
-            href = a["href"]
-            absolute = urljoin(BASE_URL, href)
-            parsed   = urlparse(absolute)
-            if parsed.netloc != urlparse(BASE_URL).netloc:
+    Sends a conditional GET when the page was seen on a previous run and
+    reuses the cached product on 304 Not Modified.
+    """
+    resp = fetch(session, bucket, url, cache.headers_for(url))
+    if resp is None:
+        return None
+    if resp.status_code == 304:
+        try:
+            return Product(**cache.payload(url))
+        except TypeError:
+            print(f"  [warn] Stale cache entry for {url}")
+            return None
+    try:
+        tree = parse_html(resp.content, _header_charset(resp))
+    except Exception as exc:
+        print(f"  [warn] Could not parse {url}: {exc}")
+        return None
+    product = parse_product_page(tree, url)
+    if product:
+        cache.store(url, resp.headers, product.to_dict())
+    return product
+
+
+def jsonl_to_json_array(src: str, dst: str) -> None:
+    """Wrap a JSON-lines file into a JSON array, streaming one product at a time."""
+    tmp = dst + ".tmp"
+    with open(src, "rb") as f_in, open(tmp, "wb") as f_out:
+        f_out.write(b"[")
+        first = True
+        for line in f_in:
+            if not line.strip():
                 continue
-            path = parsed.path
-            # WooCommerce product URLs typically contain /producto/ or /product/
-            if re.search(r"/(producto|product)/[^/]+/?$", path):
-                product_urls.add(absolute)
-
-        # Follow pagination
-        for a in soup.select(".next.page-numbers, a.next"):
-            next_href = urljoin(BASE_URL, a.get("href", ""))
-            if next_href not in visited_cat_pages and rp.can_fetch("*", next_href):
-                pages_to_visit.append(next_href)
-
-        # Follow category links (avoid pagination and misc links)
-        for a in soup.select(".product-categories a, .widget_product_categories a"):
-            cat_href = urljoin(BASE_URL, a.get("href", ""))
-            if cat_href not in visited_cat_pages and rp.can_fetch("*", cat_href):
-                pages_to_visit.append(cat_href)
-
-        time.sleep(DELAY)
-
-    return list(product_urls)
+            f_out.write(b"\n" if first else b",\n")
+            f_out.write(orjson.dumps(orjson.loads(line), option=orjson.OPT_INDENT_2))
+            first = False
+        f_out.write(b"]" if first else b"\n]")
+    os.replace(tmp, dst)
 
 
 # ---------------------------------------------------------------------------
@@ -398,60 +557,75 @@ def main() -> None:
     print(f"Output     : {OUTPUT_FILE}")
     print(f"Delay      : {DELAY}s between requests")
     print(f"Max pages  : {MAX_PAGES}")
+    print(f"Workers    : {CONCURRENCY}")
     print()
 
-    session = requests.Session()
-    session.headers.update(HEADERS)
+    session = build_session()
+    # One bucket for every request the scraper makes, whatever the phase or thread.
+    bucket  = TokenBucket(1.0 / DELAY if DELAY > 0 else math.inf)
 
     # Robots.txt compliance.
-    rp = build_robot_parser()
+    rp = build_robot_parser(session, bucket)
     ua = HEADERS["User-Agent"]
     if not rp.can_fetch(ua, BASE_URL + "/") and not rp.can_fetch("*", BASE_URL + "/"):
         print("[error] robots.txt explicitly disallows crawling. Aborting.")
         return
 
+    can_fetch = cached_can_fetch(rp)
+
     # Phase 1 – discover product URLs
     print("Phase 1: Discovering product URLs…")
-    product_urls = discover_product_urls(session, rp)
+    product_urls = discover_product_urls(session, bucket, can_fetch)
     print(f"  Found {len(product_urls)} unique product URL(s).")
     print()
 
     if not product_urls:
         print("[warn] No products found. Saving empty list.")
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
+        with open(OUTPUT_FILE, "wb") as f:
+            f.write(orjson.dumps([], option=orjson.OPT_INDENT_2))
         return
 
-    # Phase 2 – scrape each product page
+    # Phase 2 – scrape each product page, appending each one to JSONL_FILE
+    # as soon as it is parsed so a crash keeps everything scraped so far.
     print("Phase 2: Scraping product pages…")
-    products: list[dict] = []
+    scraped = 0
 
-    for i, url in enumerate(sorted(product_urls), 1):
-        if not rp.can_fetch("*", url):
-            print(f"  [{i}/{len(product_urls)}] Skipped (robots.txt): {url}")
-            continue
+    allowed = []
+    for url in sorted(product_urls):
+        if can_fetch(url):
+            allowed.append(url)
+        else:
+            print(f"  Skipped (robots.txt): {url}")
+    total = len(allowed)
 
-        print(f"  [{i}/{len(product_urls)}] {url}")
-        soup = get_page(session, url)
-        if soup:
-            product = parse_product_page(soup, url)
-            if product:
-                products.append(asdict(product))
-                print(f"    ✓ {product.name} | {product.price} | {product.stock_status}")
-            else:
-                print(f"    ✗ Could not parse product.")
-        time.sleep(DELAY)
+    cache = ConditionalCache(CACHE_FILE, CACHE_VERSION)
+    try:
+        with open(JSONL_FILE, "wb") as out, ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+            # map() yields in input (sorted URL) order and drops each future as it
+            # is yielded, so output is stable across runs and written products are freed.
+            results = pool.map(functools.partial(_scrape_one, session, bucket, cache), allowed)
+            for i, (url, product) in enumerate(zip(allowed, results), 1):
+                print(f"  [{i}/{total}] {url}")
+                if product:
+                    out.write(orjson.dumps(product.to_dict()) + b"\n")
+                    out.flush()
+                    scraped += 1
+                    print(f"    ✓ {product.name} | {product.price} | {product.stock_status}")
+                else:
+                    print(f"    ✗ Could not parse product.")
+    finally:
+        cache.save()
 
     # Phase 3 – write output
     print()
-    print(f"Phase 3: Writing {len(products)} product(s) to {OUTPUT_FILE}")
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(products, f, ensure_ascii=False, indent=2)
+    print(f"Phase 3: Writing {scraped} product(s) to {OUTPUT_FILE}")
+    jsonl_to_json_array(JSONL_FILE, OUTPUT_FILE)
 
     print()
     print("Done!")
-    print(f"  Products scraped : {len(products)}")
+    print(f"  Products scraped : {scraped}")
     print(f"  Output file      : {OUTPUT_FILE}")
+    print(f"  JSON lines       : {JSONL_FILE}")
 
 
 if __name__ == "__main__":